@@ -64,4 +64,35 @@ CLEAN_URL_PATTERNS = [
     r'\/scale-to-width-down\/\d+',  # Scale down
     r'\/scale-to-width\/\d+',  # Scale to width
     r'\/scale-to-height\/\d+',  # Scale to height
-]
\ No newline at end of file
+]
+
+# Offline search index
+SEARCH_INDEX_DIR = "_search"  # Relative to project root, holds the index and search page
+SEARCH_PREFIX_LENGTH = 2  # Terms are sharded by this many leading characters
+SEARCH_MIN_TOKEN_LENGTH = 2  # Shorter tokens are not indexed
+SEARCH_MAX_TERMS_PER_PAGE = 2000  # Keep only the most frequent terms of very long pages
+SEARCH_TITLE_WEIGHT = 10  # Extra weight for terms found in the page title
+SEARCH_SKIP_TAGS = ['script', 'style', 'noscript', 'template', 'nav', 'footer', 'aside']
+SEARCH_MAX_SHARD_BYTES = 200 * 1024  # Larger shards are split into shards with one more prefix character
+SEARCH_MAX_POSTINGS_PER_TERM = 2000  # Very common terms only keep their best matching pages
+SEARCH_FLUSH_POSTINGS = 2000000  # Write pending postings to the shards after this many
+SEARCH_STOPWORDS = [
+    "the", "and", "of", "to", "in", "is", "it", "for", "on", "as", "was", "with", "be", "by",
+    "at", "an", "or", "are", "this", "that", "from", "his", "her", "he", "she", "they", "but",
+    "not", "has", "have", "had", "its", "their", "which", "were", "been", "also", "can", "will",
+    "и", "в", "во", "не", "что", "он", "на", "я", "с", "со", "как", "а", "то", "все", "она",
+    "так", "его", "но", "да", "ты", "к", "у", "же", "вы", "за", "бы", "по", "из", "от", "это",
+]
+
+# Reference graph (page -> pages, page -> assets) recorded while rewriting links
+REFERENCE_GRAPH_FILE = "_refgraph.json.gz"  # Relative to project root
+ASSET_EXTENSIONS = IMAGE_EXTENSIONS + ['.css']  # Files in the CDN directories considered for pruning
+PRUNED_ASSETS_DIR = "_pruned_assets"  # Suffix of the directory orphans are moved to, next to the project root
+
+# Link validation
+LINK_VALIDATION_WORKERS = 32  # Concurrent directory scans when listing the mirror
+LINK_REPORT_FILE = "_broken_links.tsv"  # Relative to project root
+
+# Dry run
+DRY_RUN_SAMPLE_SIZE = 1000  # Pages processed in a dry run
+DRY_RUN_SIZE_CLASSES = [16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024]  # Page size boundaries for stratified sampling
@@ -0,0 +1,292 @@
+"""
+Dry run module - estimates the effect of the cleaning rules from a stratified sample
+"""
+import bisect
+import math
+import os
+import random
+import re
+import statistics
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool, get_start_method
+from pathlib import Path
+from bs4 import BeautifulSoup
+from loguru import logger
+from postprocess.config import (
+    REMOVE_SELECTORS,
+    CLEAN_URL_PATTERNS,
+    IMAGE_DOMAINS,
+    DRY_RUN_SIZE_CLASSES,
+    SEARCH_INDEX_DIR,
+    LINK_VALIDATION_WORKERS,
+)
+from postprocess.content_stabilizer import stabilize_content
+from postprocess.html_cleaner import clean_html
+from postprocess.link_rewriter import rewrite_links
+from postprocess.link_validator import LinkValidator, MirrorListing
+from postprocess.reference_graph import ReferenceGraph
+from postprocess.search_indexer import SearchIndex
+
+Z_95 = 1.96
+# Links fix_article_links looks up, by walking the whole mirror without a listing
+WIKI_LINK_PATTERN = re.compile(r'<a\s[^>]*href="[^"]*/wiki/')
+STAGES = ['read', 'stabilize', 'clean', 'rewrite']
+
+_stages = {}  # Per worker process, see _init_worker
+_listing = None  # Scanned once by run_dry_run, inherited by forked workers
+
+
+def _init_worker(project_root, search_index, reference_graph, validate_links, by_name=None):
+    """
+    Set up the optional stages in each worker the same way the real run
+    would. Forked workers share the parent's mirror listing, spawned ones
+    get only its file name index and rebuild the rest without a scan.
+    """
+    # Per-element debug logging from the stages would dominate the timings
+    logger.disable("postprocess")
+    listing = _listing if by_name is None else MirrorListing(project_root, by_name)
+    _stages['listing'] = listing
+    _stages['link_validator'] = LinkValidator(project_root, listing) if validate_links else None
+    _stages['reference_graph'] = ReferenceGraph(project_root) if reference_graph else None
+    _stages['search_index'] = SearchIndex(project_root, read_only=True) if search_index else None
+
+
+def count_rules(html_content):
+    """
+    Count matches and matched bytes of every REMOVE_SELECTORS and
+    CLEAN_URL_PATTERNS rule in a stabilized page
+    """
+    soup = BeautifulSoup(html_content, 'lxml')
+    metrics = {}
+
+    # Remove matches selector by selector as clean_html does, so elements
+    # inside an earlier match or an enclosing match aren't counted again
+    for selector in REMOVE_SELECTORS:
+        matches = 0
+        matched_bytes = 0
+        for element in soup.select(selector):
+            if element.decomposed:
+                continue
+            matches += 1
+            matched_bytes += len(str(element).encode('utf-8'))
+            element.decompose()
+        metrics[f"selector {selector}"] = matches
+        metrics[f"selector {selector} bytes"] = matched_bytes
+
+    # URL patterns only apply to CDN images that survive cleaning
+    for pattern in CLEAN_URL_PATTERNS:
+        metrics[f"url {pattern}"] = 0
+        metrics[f"url {pattern} bytes"] = 0
+    for img in soup.find_all(['img', 'source']):
+        src = img.get('src')
+        if not src or not any(domain in src for domain in IMAGE_DOMAINS):
+            continue
+        cleaned = src.split('#')[0]
+        for pattern in CLEAN_URL_PATTERNS:
+            matches = re.findall(pattern, cleaned)
+            metrics[f"url {pattern}"] += len(matches)
+            metrics[f"url {pattern} bytes"] += sum(len(match) for match in matches)
+            cleaned = re.sub(pattern, '', cleaned)
+
+    return metrics
+
+
+def analyze_page(html_file):
+    """
+    Run the pipeline on one page without writing it, returning its metrics
+    """
+    metrics = {}
+
+    start = time.perf_counter()
+    with open(html_file, 'r', encoding='utf-8', errors='ignore') as f:
+        content = f.read()
+    metrics["time read"] = time.perf_counter() - start
+
+    def timed(stage, run, html):
+        start = time.perf_counter()
+        result = run(html)
+        metrics[f"time {stage}"] = time.perf_counter() - start
+        metrics[f"bytes removed {stage}"] = len(html.encode('utf-8')) - len(result.encode('utf-8'))
+        return result
+
+    content = timed('stabilize', lambda html: stabilize_content(html, html_file), content)
+    metrics.update(count_rules(content))
+    content = timed('clean', clean_html, content)
+    metrics["wiki links"] = len(WIKI_LINK_PATTERN.findall(content))
+
+    # Article links are always looked up in the cached listing, the cost of
+    # walking the mirror for them is extrapolated in run_dry_run
+    link_validator = _stages['link_validator']
+    broken = len(link_validator.broken) if link_validator else 0
+    timed('rewrite', lambda html: rewrite_links(html, html_file, _stages['reference_graph'], link_validator,
+                                                _stages['search_index'], _stages['listing']), content)
+    if link_validator:
+        metrics["broken links"] = len(link_validator.broken) - broken
+
+    return metrics
+
+
+def _safe_analyze(html_file):
+    try:
+        return html_file, analyze_page(html_file), None
+    except Exception as e:
+        return html_file, None, str(e)
+
+
+def time_tree_walk(project_root):
+    """Time one os.walk over the mirror, the most a single article lookup costs without a listing"""
+    start = time.perf_counter()
+    for _ in os.walk(project_root):
+        pass
+    return time.perf_counter() - start
+
+
+def list_pages(listing):
+    """HTML files of the mirror with their sizes, relative to the project root"""
+    html_files = sorted(rel_path for rel_path in listing.files
+                        if rel_path.endswith('.html') and not rel_path.startswith(f"{SEARCH_INDEX_DIR}/"))
+    with ThreadPoolExecutor(max_workers=LINK_VALIDATION_WORKERS) as executor:
+        sizes = executor.map(lambda rel_path: os.path.getsize(listing.project_root / rel_path), html_files)
+        return list(zip(html_files, sizes))
+
+
+def stratify(pages, sample_size):
+    """
+    Group pages by directory and size class. Directories are collapsed to
+    coarser levels until every stratum can get at least two samples.
+    """
+    for depth in (2, 1, 0):
+        strata = defaultdict(list)
+        for rel_path, size in pages:
+            directory = '/'.join(rel_path.split('/')[:-1][:depth])
+            strata[(directory, bisect.bisect_right(DRY_RUN_SIZE_CLASSES, size))].append(rel_path)
+        if len(strata) * 2 <= sample_size:
+            break
+    return strata
+
+
+def draw_sample(strata, sample_size, rng):
+    """Proportional allocation with at least two pages per stratum"""
+    total = sum(len(paths) for paths in strata.values())
+    sample = {}
+    for key, paths in strata.items():
+        n = max(2, round(sample_size * len(paths) / total))
+        sample[key] = rng.sample(paths, min(n, len(paths)))
+    return sample
+
+
+def estimate_total(values_by_stratum, stratum_sizes, fallback_variance):
+    """
+    Stratified estimate of a population total and the half-width of its
+    95% confidence interval
+    """
+    total = 0.0
+    variance = 0.0
+    for key, values in values_by_stratum.items():
+        population = stratum_sizes[key]
+        n = len(values)
+        if not n:
+            continue
+        total += population * statistics.fmean(values)
+        s2 = statistics.variance(values) if n > 1 else fallback_variance
+        variance += population ** 2 * (1 - n / population) * s2 / n
+    return total, Z_95 * math.sqrt(variance)
+
+
+def run_dry_run(project_root, sample_size, seed=None, search_index=False, reference_graph=True,
+                validate_links=False):
+    """
+    Process a stratified random sample of the mirror on all cores without
+    writing anything, and extrapolate per-rule and per-stage totals to the
+    whole mirror. The optional stages are enabled as in the real run, so the
+    rewrite time includes link lookups, the reference graph and indexing.
+    Article links are looked up in a cached listing even without
+    --validate-links; the real run would walk the mirror for each of them
+    instead, which is estimated from a single timed walk.
+    """
+    global _listing
+    started = time.perf_counter()
+    project_root = Path(project_root)
+
+    _listing = MirrorListing(project_root)
+    pages = list_pages(_listing)
+    if not pages:
+        logger.warning(f"No HTML files found in {project_root}")
+        return
+
+    strata = stratify(pages, sample_size)
+    sample = draw_sample(strata, sample_size, random.Random(seed))
+    stratum_of = {project_root / rel_path: key for key, paths in sample.items() for rel_path in paths}
+    logger.info(f"Dry run: sampling {len(stratum_of)} of {len(pages)} pages from {len(strata)} strata "
+                f"on {os.cpu_count()} cores")
+
+    results = defaultdict(lambda: defaultdict(list))  # metric -> stratum -> values
+    failures = 0
+    by_name = None if get_start_method() == 'fork' else _listing.by_name
+    initargs = (project_root, search_index, reference_graph, validate_links, by_name)
+    with Pool(os.cpu_count(), initializer=_init_worker, initargs=initargs) as pool:
+        for html_file, metrics, error in pool.imap_unordered(_safe_analyze, list(stratum_of), chunksize=8):
+            if error:
+                failures += 1
+                logger.error(f"Error processing {html_file.name}: {error}")
+                continue
+            for metric, value in metrics.items():
+                results[metric][stratum_of[html_file]].append(value)
+
+    stratum_sizes = {key: len(paths) for key, paths in strata.items()}
+
+    def estimate(values_by_stratum):
+        all_values = [value for values in values_by_stratum.values() for value in values]
+        fallback = statistics.variance(all_values) if len(all_values) > 1 else 0.0
+        return estimate_total(values_by_stratum, stratum_sizes, fallback)
+
+    def interval(value, half_width, unit):
+        if unit == 'MB':
+            return f"{value / 1024 / 1024:.2f} ± {half_width / 1024 / 1024:.2f} MB"
+        if unit == 's':
+            return f"{value:.1f} ± {half_width:.1f} s"
+        return f"{value:.0f} ± {half_width:.0f}"
+
+    print(f"\n{'stage':<40} {'time (95% CI)':>24} {'bytes removed (95% CI)':>28}")
+    for stage in STAGES:
+        label = f"{stage} (cached listing)" if stage == 'rewrite' and not validate_links else stage
+        line = f"{label:<40} {interval(*estimate(results[f'time {stage}']), 's'):>24}"
+        if stage != 'read':
+            line += f" {interval(*estimate(results[f'bytes removed {stage}']), 'MB'):>28}"
+        print(line)
+
+    # Most effective rules first, rules without any match in the sample last
+    rules = [f"selector {selector}" for selector in REMOVE_SELECTORS] + [f"url {pattern}" for pattern in CLEAN_URL_PATTERNS]
+    rows = []
+    for rule in rules:
+        sample_matches = sum(sum(values) for values in results[rule].values())
+        rows.append((rule, sample_matches, estimate(results[rule]), estimate(results[f"{rule} bytes"])))
+    rows.sort(key=lambda row: (-row[3][0], -row[1], row[0]))
+
+    print(f"\n{'rule':<40} {'sample':>8} {'matches (95% CI)':>24} {'bytes matched (95% CI)':>28}")
+    for rule, sample_matches, matches, matched_bytes in rows:
+        print(f"{rule:<40} {sample_matches:>8} {interval(*matches, ''):>24} {interval(*matched_bytes, 'MB'):>28}")
+
+    if validate_links:
+        print(f"\nEstimated broken links: {interval(*estimate(results['broken links']), '')}")
+
+    # Stage times of a page are summed before estimating so the interval
+    # accounts for their correlation
+    per_page_time = {}
+    for key in sample:
+        times = [results[f"time {stage}"][key] for stage in STAGES]
+        per_page_time[key] = [sum(values) for values in zip(*times)]
+    total, half_width = estimate(per_page_time)
+
+    enabled = [name for name, on in (("--validate-links", validate_links), ("reference graph", reference_graph),
+                                     ("--search-index", search_index)) if on]
+    print(f"\nEstimated full run time (single process, excluding writes, with {', '.join(enabled) or 'no optional stages'}): "
+          f"{total / 60:.1f} ± {half_width / 60:.1f} min")
+    if not validate_links:
+        links, links_half_width = estimate(results["wiki links"])
+        walk = time_tree_walk(project_root)
+        print(f"Without --validate-links the real run walks the mirror for each of {interval(links, links_half_width, '')} "
+              f"article links ({walk:.3f}s per walk): up to {links * walk / 60:.1f} ± {links_half_width * walk / 60:.1f} min more")
+    print(f"Dry run finished in {time.perf_counter() - started:.1f}s, {failures} pages failed, nothing was written")
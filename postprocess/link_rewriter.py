@@ -102,9 +102,10 @@ def fix_image_paths(soup, current_file_path, project_root):
     return modified
 
 
-def fix_article_links(soup, current_file_path, project_root):
+def fix_article_links(soup, current_file_path, project_root, listing=None):
     """
-    Convert wiki-style links to local relative paths
+    Convert wiki-style links to local relative paths.
+    With a cached mirror listing, targets are looked up there instead of walking the tree.
     """
     modified = False
     
@@ -131,13 +132,19 @@ def fix_article_links(soup, current_file_path, project_root):
                 try:
                     # Look for the target file in the project
                     target_file = None
-                    for root, dirs, files in os.walk(project_root):
-                        for file in files:
-                            if file == local_file or file.startswith(f"{safe_filename}_") or safe_filename in file:
-                                target_file = Path(root) / file
+                    if listing is not None:
+                        host = current_file_path.relative_to(listing.project_root).parts[0]
+                        found = listing.find_page(safe_filename, host)
+                        if found:
+                            target_file = listing.project_root / found
+                    else:
+                        for root, dirs, files in os.walk(project_root):
+                            for file in files:
+                                if file == local_file or file.startswith(f"{safe_filename}_") or safe_filename in file:
+                                    target_file = Path(root) / file
+                                    break
+                            if target_file:
                                 break
-                        if target_file:
-                            break
                     
                     if target_file:
                         rel_path = os.path.relpath(target_file, current_file_path.parent)
@@ -163,9 +170,15 @@ def fix_article_links(soup, current_file_path, project_root):
     return modified
 
 
-def rewrite_links(html_content, current_file_path):
+def rewrite_links(html_content, current_file_path, reference_graph=None, link_validator=None, search_index=None,
+                  listing=None):
     """
-    Main function to rewrite both image paths and article links
+    Main function to rewrite both image paths and article links.
+    If a link validator is given, article targets are looked up in its mirror
+    listing, site-relative links are resolved and broken links are recorded.
+    A mirror listing can also be given on its own for the article lookups.
+    If a reference graph is given, the page's references are recorded in it.
+    If a search index is given, the page's text is indexed from the same tree.
     """
     soup = BeautifulSoup(html_content, 'lxml')
     
@@ -176,7 +189,20 @@ def rewrite_links(html_content, current_file_path):
     img_modified = fix_image_paths(soup, current_file_path, project_root)
     
     # Fix article links
-    link_modified = fix_article_links(soup, current_file_path, project_root)
+    if link_validator is not None:
+        listing = link_validator.listing
+    link_modified = fix_article_links(soup, current_file_path, project_root, listing)
+    
+    # Resolve remaining site-relative links and check all local targets
+    if link_validator is not None:
+        link_modified = link_validator.validate(soup, current_file_path) or link_modified
+    
+    # Record references from the rewritten tree
+    if reference_graph is not None:
+        reference_graph.add_page(soup, current_file_path)
+    
+    if search_index is not None:
+        search_index.add_page(soup, current_file_path)
     
     # Return modified content if any changes were made
     if img_modified or link_modified:
@@ -0,0 +1,208 @@
+"""
+Link validator module - resolves site-relative links and reports broken ones
+"""
+import bisect
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import unquote, urlparse
+from pathlib import Path
+from loguru import logger
+from postprocess.config import IMAGE_DOMAINS, LINK_VALIDATION_WORKERS, LINK_REPORT_FILE
+
+
+def _scan_directory(path):
+    """List the files and subdirectories of a single directory"""
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                else:
+                    files.append(entry.path)
+    except OSError as e:
+        logger.warning(f"Could not list {path}: {e}")
+    return files, dirs
+
+
+def sanitize_page_name(name):
+    """Turn a page name into the file name used in the mirror, as fix_article_links does"""
+    return re.sub(r'[<>:"/\\|?*]', '_', name)
+
+
+class MirrorListing:
+    """
+    Cached listing of every file in the mirror, so links are checked with
+    set lookups instead of one filesystem call per link
+    """
+
+    def __init__(self, project_root, by_name=None):
+        """Scan the mirror, or rebuild the listing from the by_name index of an earlier scan"""
+        self.project_root = Path(project_root)
+        self.files = set()  # Paths relative to the project root
+        self.by_name = {}  # File name -> relative paths
+        self.sorted_names = []
+        if by_name is None:
+            self._build()
+        else:
+            self.by_name = by_name
+            self.files = {rel_path for paths in by_name.values() for rel_path in paths}
+            self.sorted_names = sorted(by_name)
+
+    def _build(self):
+        """Scan all directories concurrently, each directory is one task"""
+        root = str(self.project_root)
+        with ThreadPoolExecutor(max_workers=LINK_VALIDATION_WORKERS) as executor:
+            pending = {executor.submit(_scan_directory, root)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, dirs = future.result()
+                    for file in files:
+                        rel_path = os.path.relpath(file, root).replace('\\', '/')
+                        self.files.add(rel_path)
+                        self.by_name.setdefault(os.path.basename(file), []).append(rel_path)
+                    pending.update(executor.submit(_scan_directory, directory) for directory in dirs)
+
+        self.sorted_names = sorted(self.by_name)
+        logger.info(f"Listed {len(self.files)} files in {self.project_root}")
+
+    def exists(self, rel_path):
+        return rel_path in self.files
+
+    def find_page(self, safe_filename, prefer_dir=None):
+        """
+        Find an article file by its sanitized name, either exactly or with a
+        suffix added by the downloader (Name_1.html). Returns a relative path or None.
+        """
+        candidates = list(self.by_name.get(f"{safe_filename}.html", []))
+        if not candidates:
+            prefix = f"{safe_filename}_"
+            numbered = re.compile(re.escape(prefix) + r'\d+\.html')
+            i = bisect.bisect_left(self.sorted_names, prefix)
+            while i < len(self.sorted_names) and self.sorted_names[i].startswith(prefix):
+                if numbered.fullmatch(self.sorted_names[i]):
+                    candidates.extend(self.by_name[self.sorted_names[i]])
+                i += 1
+
+        if not candidates:
+            return None
+        if prefer_dir:
+            for candidate in candidates:
+                if candidate.startswith(f"{prefer_dir}/"):
+                    return candidate
+        return min(candidates)
+
+
+class LinkValidator:
+    """
+    Rewrites site-relative links (/f/..., /wiki/Special:..., Category: pages)
+    and absolute links into mirrored hosts to local files, and collects links
+    whose local target doesn't exist
+    """
+
+    def __init__(self, project_root, listing=None):
+        self.project_root = Path(project_root)
+        self.listing = listing if listing is not None else MirrorListing(self.project_root)
+        self.hosts = {rel_path.split('/', 1)[0] for rel_path in self.listing.files if '/' in rel_path}
+        self.broken = []  # (page, link, target)
+        self.checked = 0
+        self.rewritten = 0
+
+    def _host_dir(self, current_file_path):
+        """Top-level mirror directory (the host) a page belongs to"""
+        parts = Path(current_file_path).relative_to(self.project_root).parts
+        return parts[0] if len(parts) > 1 else ''
+
+    def resolve_site_path(self, path, host):
+        """
+        Map a site path like /f/p/123 or /wiki/Category:Foo to a mirrored file
+        """
+        path = unquote(path).strip('/')
+        base = f"{host}/{path}" if host else path
+        for candidate in (base, f"{base}.html", f"{base}/index.html"):
+            if self.listing.exists(candidate.lstrip('/')):
+                return candidate.lstrip('/')
+        if not path:
+            return None
+
+        # Wiki articles are often saved flat under their (sanitized) page name,
+        # other site paths have to match exactly
+        if '/wiki/' not in f"/{path}":
+            return None
+        name = f"/{path}".split('/wiki/', 1)[1]
+        return self.listing.find_page(sanitize_page_name(name), host)
+
+    def _target(self, url, current_file_path):
+        """
+        Classify a link. Returns (kind, target) where kind is 'local' for
+        relative links, 'site' for links that need rewriting, or None to skip.
+        """
+        url = url.strip()
+        if not url or url.startswith(('#', 'mailto:', 'javascript:', 'data:', 'tel:')):
+            return None, None
+
+        parsed = urlparse(url)
+        if parsed.scheme in ('http', 'https') or url.startswith('//'):
+            # Absolute links into a mirrored host are treated as site-relative
+            host = parsed.netloc
+            if host in self.hosts and not any(domain in host for domain in IMAGE_DOMAINS):
+                return 'site', (host, parsed.path)
+            return None, None
+        if parsed.scheme:
+            return None, None
+
+        if url.startswith('/'):
+            if any(domain in url for domain in IMAGE_DOMAINS):
+                return None, None
+            return 'site', (self._host_dir(current_file_path), parsed.path)
+
+        if not parsed.path:
+            return None, None
+        target = os.path.normpath(os.path.join(Path(current_file_path).parent, unquote(parsed.path)))
+        return 'local', os.path.relpath(target, self.project_root).replace('\\', '/')
+
+    def validate(self, soup, current_file_path):
+        """
+        Rewrite resolvable site-relative links and record broken ones.
+        Returns True if the tree was modified.
+        """
+        modified = False
+        page = Path(current_file_path).relative_to(self.project_root).as_posix()
+
+        for tag, attr in (('a', 'href'), ('img', 'src')):
+            for element in soup.find_all(tag, **{attr: True}):
+                url = element[attr]
+                kind, target = self._target(url, current_file_path)
+                if kind is None:
+                    continue
+                self.checked += 1
+
+                if kind == 'site':
+                    host, path = target
+                    resolved = self.resolve_site_path(path, host)
+                    if resolved:
+                        rel_path = os.path.relpath(self.project_root / resolved, Path(current_file_path).parent)
+                        fragment = urlparse(url).fragment
+                        element[attr] = rel_path.replace('\\', '/') + (f"#{fragment}" if fragment else '')
+                        modified = True
+                        self.rewritten += 1
+                        logger.debug(f"Fixed site link: {url} -> {element[attr]}")
+                    else:
+                        self.broken.append((page, url, f"{host}{path}"))
+                elif not self.listing.exists(target) and not self.listing.exists(f"{target}/index.html"):
+                    self.broken.append((page, url, target))
+
+        return modified
+
+    def write_report(self):
+        """Write the broken links as tab-separated page, link, expected target"""
+        report_path = self.project_root / LINK_REPORT_FILE
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write("page\tlink\ttarget\n")
+            for page, url, target in sorted(self.broken):
+                url = re.sub(r'\s', ' ', url)
+                f.write(f"{page}\t{url}\t{target}\n")
+        logger.info(f"Checked {self.checked} links: {self.rewritten} site links rewritten, "
+                     f"{len(self.broken)} broken (report: {report_path})")
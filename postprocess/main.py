@@ -7,10 +7,14 @@ from pathlib import Path
 from loguru import logger
 import argparse
 
-from postprocess.config import PROJECT_ROOT, BACKUP_ROOT
+from postprocess.config import PROJECT_ROOT, BACKUP_ROOT, DRY_RUN_SAMPLE_SIZE, SEARCH_INDEX_DIR
 from postprocess.content_stabilizer import stabilize_content
+from postprocess.dry_run import run_dry_run
 from postprocess.html_cleaner import clean_html
 from postprocess.link_rewriter import rewrite_links
+from postprocess.link_validator import LinkValidator
+from postprocess.reference_graph import ReferenceGraph
+from postprocess.search_indexer import SearchIndex
 from postprocess.utils import setup_logging
 
 
@@ -21,12 +25,14 @@ def create_backup():
         logger.info(f"Backup created at {BACKUP_ROOT}")
 
 
-def process_mirror():
+def process_mirror(search_index=None, reference_graph=None, link_validator=None):
     """Process the entire mirror"""
     logger.info(f"Starting post-processing of mirror at {PROJECT_ROOT}")
     
     # Process all HTML files
-    html_files = list(PROJECT_ROOT.rglob("*.html"))
+    # Don't process the search page we generated ourselves
+    index_dir = PROJECT_ROOT / SEARCH_INDEX_DIR
+    html_files = [f for f in PROJECT_ROOT.rglob("*.html") if index_dir not in f.parents]
     logger.info(f"Found {len(html_files)} HTML files to process")
     
     for i, html_file in enumerate(html_files, 1):
@@ -40,7 +46,7 @@ def process_mirror():
             # Apply processing steps in order
             content = stabilize_content(content, html_file)
             content = clean_html(content)
-            content = rewrite_links(content, html_file)
+            content = rewrite_links(content, html_file, reference_graph, link_validator, search_index)
             
             # Write the processed content back
             with open(html_file, 'w', encoding='utf-8') as f:
@@ -51,6 +57,15 @@ def process_mirror():
         except Exception as e:
             logger.error(f"Error processing {html_file.name}: {e}")
 
+    if search_index:
+        search_index.write()
+    
+    if reference_graph:
+        reference_graph.save()
+    
+    if link_validator:
+        link_validator.write_report()
+
     logger.info("Mirror post-processing completed!")
 
 
@@ -58,6 +73,12 @@ def main():
     parser = argparse.ArgumentParser(description="Post-process Fandom mirror downloaded with Offline Explorer")
     parser.add_argument("--no-backup", action="store_true", help="Skip creating backup")
     parser.add_argument("--project-root", type=str, help="Path to the OE project Download folder")
+    parser.add_argument("--search-index", action="store_true", help="Build the offline full-text search index")
+    parser.add_argument("--no-reference-graph", action="store_true", help="Skip recording the page/asset reference graph")
+    parser.add_argument("--validate-links", action="store_true", help="Resolve site-relative links and write a broken-link report")
+    parser.add_argument("--dry-run", action="store_true", help="Estimate rule impact and run time from a sample without writing anything")
+    parser.add_argument("--sample-size", type=int, default=DRY_RUN_SAMPLE_SIZE, help="Number of pages processed in a dry run")
+    parser.add_argument("--seed", type=int, help="Random seed for the dry run sample")
     
     args = parser.parse_args()
     
@@ -72,12 +93,22 @@ def main():
     
     logger.info(f"Project root: {PROJECT_ROOT}")
     
+    if args.dry_run:
+        run_dry_run(PROJECT_ROOT, args.sample_size, args.seed, search_index=args.search_index,
+                    reference_graph=not args.no_reference_graph, validate_links=args.validate_links)
+        return
+    
     # Create backup unless skipped
     if not args.no_backup:
         create_backup()
     
+    # Load the search index of a previous run so unchanged pages are skipped
+    search_index = SearchIndex(PROJECT_ROOT) if args.search_index else None
+    reference_graph = None if args.no_reference_graph else ReferenceGraph(PROJECT_ROOT)
+    link_validator = LinkValidator(PROJECT_ROOT) if args.validate_links else None
+    
     # Process the mirror
-    process_mirror()
+    process_mirror(search_index, reference_graph, link_validator)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,87 @@
+"""
+Find orphaned assets and unlinked pages using the reference graph of the last run
+"""
+import argparse
+import shutil
+from pathlib import Path
+from loguru import logger
+
+from postprocess.config import PROJECT_ROOT, PRUNED_ASSETS_DIR, SEARCH_INDEX_DIR
+from postprocess.reference_graph import ReferenceGraph
+from postprocess.utils import setup_logging
+
+
+def unrecorded_pages(graph):
+    """HTML files in the mirror whose references were not recorded"""
+    recorded = graph.recorded_pages()
+    index_dir = graph.project_root / SEARCH_INDEX_DIR
+    return sorted(
+        rel_path for rel_path in (
+            html_file.relative_to(graph.project_root).as_posix()
+            for html_file in graph.project_root.rglob("*.html")
+            if index_dir not in html_file.parents
+        )
+        if rel_path not in recorded
+    )
+
+
+def move_assets(project_root, orphans, destination):
+    """Move orphaned assets out of the mirror, keeping their relative paths"""
+    moved = 0
+    for rel_path in orphans:
+        target = destination / rel_path
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(project_root / rel_path), str(target))
+            moved += 1
+        except OSError as e:
+            logger.error(f"Failed to move {rel_path}: {e}")
+    logger.info(f"Moved {moved} orphaned assets to {destination}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List orphaned assets and unlinked pages of a processed mirror")
+    parser.add_argument("--project-root", type=str, help="Path to the OE project Download folder")
+    parser.add_argument("--move", action="store_true", help="Move orphaned assets out of the mirror")
+    parser.add_argument("--move-to", type=str, help=f"Destination for moved assets (default: <project root>{PRUNED_ASSETS_DIR} next to the mirror)")
+    parser.add_argument("--force", action="store_true", help="Move even if some pages are missing from the reference graph")
+
+    args = parser.parse_args()
+
+    setup_logging()
+
+    project_root = Path(args.project_root) if args.project_root else PROJECT_ROOT
+
+    try:
+        graph = ReferenceGraph.load(project_root)
+    except FileNotFoundError:
+        logger.error(f"No reference graph found in {project_root}, run the post-processing first")
+        return
+
+    orphans = graph.orphaned_assets()
+    for rel_path in orphans:
+        print(f"orphaned asset: {rel_path}")
+
+    unlinked = graph.unlinked_pages()
+    for rel_path in unlinked:
+        print(f"unlinked page: {rel_path}")
+
+    orphan_bytes = sum((project_root / rel_path).stat().st_size for rel_path in orphans)
+    logger.info(f"{len(orphans)} orphaned assets ({orphan_bytes / 1024 / 1024:.1f} MB), {len(unlinked)} unlinked pages")
+
+    if not args.move or not orphans:
+        return
+
+    # Assets referenced only by pages that were not recorded would be moved by mistake
+    missing = unrecorded_pages(graph)
+    if missing and not args.force:
+        logger.error(f"{len(missing)} pages are missing from the reference graph (e.g. {missing[0]}), "
+                     f"rerun the post-processing or use --force")
+        return
+
+    destination = Path(args.move_to) if args.move_to else project_root.parent / f"{project_root.name}{PRUNED_ASSETS_DIR}"
+    move_assets(project_root, orphans, destination)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Reference graph module - records which pages and assets every page references
+"""
+import gzip
+import json
+import os
+import re
+from urllib.parse import unquote, urlparse
+from pathlib import Path
+from loguru import logger
+from postprocess.config import IMAGE_DOMAINS, REFERENCE_GRAPH_FILE, ASSET_EXTENSIONS
+from postprocess.link_rewriter import clean_url
+
+GRAPH_VERSION = 1
+CSS_URL_PATTERN = re.compile(r'url\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)')
+CSS_IMPORT_PATTERN = re.compile(r'@import\s+[\'"]([^\'"]+)[\'"]')
+
+# Attributes besides <a href> and srcset that load a file
+ASSET_ATTRIBUTES = [
+    ('img', 'src'),
+    ('source', 'src'),
+    ('link', 'href'),  # Stylesheets, icons, apple-touch-icon, preload, ...
+    ('video', 'poster'),
+    ('video', 'src'),
+    ('audio', 'src'),
+    ('track', 'src'),
+    ('object', 'data'),
+    ('embed', 'src'),
+    ('input', 'src'),  # type="image"
+    ('iframe', 'src'),
+]
+
+
+def css_references(css):
+    """URLs referenced by a stylesheet, via url() or string @import rules"""
+    return CSS_URL_PATTERN.findall(css) + CSS_IMPORT_PATTERN.findall(css)
+
+
+def resolve_reference(url, base_dir, project_root):
+    """
+    Map a URL found in a page or stylesheet to a path relative to the project root.
+    Returns None for references that point outside the mirror.
+    """
+    url = clean_url(url.strip()).split('?')[0]
+    if not url or url.startswith(('data:', 'javascript:', 'mailto:')):
+        return None
+
+    # CDN URLs are stored under a directory named after the domain
+    for domain in IMAGE_DOMAINS:
+        if domain in url:
+            path_part = unquote(url.split(domain, 1)[1]).lstrip('/')
+            return (Path(domain) / path_part).as_posix() if path_part else None
+
+    parsed = urlparse(url)
+    if parsed.scheme or parsed.netloc or url.startswith('/'):
+        return None
+
+    target = os.path.normpath(os.path.join(base_dir, unquote(url)))
+    rel_path = os.path.relpath(target, project_root).replace('\\', '/')
+    if rel_path.startswith('../') or rel_path == '..':
+        return None
+    return rel_path
+
+
+def is_asset(rel_path):
+    """Check whether a reference points at an image or stylesheet"""
+    return Path(rel_path).suffix.lower() in ASSET_EXTENSIONS
+
+
+class ReferenceGraph:
+    """
+    Page -> pages and page -> assets edges, collected while links are rewritten
+
+    Stored gzipped as a node table plus per-page lists of node ids:
+      {"version": 1, "nodes": [path, ...], "pages": {page id: [[page ids], [asset ids]]}}
+    All paths are relative to the project root.
+    """
+
+    def __init__(self, project_root):
+        self.project_root = Path(project_root)
+        self.path = self.project_root / REFERENCE_GRAPH_FILE
+        self.nodes = []
+        self.node_ids = {}
+        self.pages = {}  # page id -> (set of page ids, set of asset ids)
+
+    def _node(self, rel_path):
+        node_id = self.node_ids.get(rel_path)
+        if node_id is None:
+            node_id = len(self.nodes)
+            self.nodes.append(rel_path)
+            self.node_ids[rel_path] = node_id
+        return node_id
+
+    def add_page(self, soup, current_file_path):
+        """
+        Record the references of a page from its rewritten tree
+        """
+        current_file_path = Path(current_file_path)
+        base_dir = current_file_path.parent
+        page_id = self._node(current_file_path.relative_to(self.project_root).as_posix())
+
+        urls = []
+        for tag, attr in ASSET_ATTRIBUTES:
+            urls.extend(element[attr] for element in soup.find_all(tag, **{attr: True}))
+        for element in soup.find_all(['img', 'source'], srcset=True):
+            urls.extend(candidate.split()[0] for candidate in element['srcset'].split(',') if candidate.strip())
+        for link in soup.find_all('a', href=True):
+            urls.append(link['href'])
+        # Backgrounds, icons and imports referenced from inline styles and <style> blocks
+        for element in soup.find_all(style=True):
+            urls.extend(css_references(element['style']))
+        for style in soup.find_all('style'):
+            urls.extend(css_references(style.get_text()))
+
+        linked_pages, assets = set(), set()
+        for url in urls:
+            rel_path = resolve_reference(url, base_dir, self.project_root)
+            if not rel_path:
+                continue
+            if is_asset(rel_path):
+                assets.add(self._node(rel_path))
+            elif rel_path.endswith('.html'):
+                target_id = self._node(rel_path)
+                if target_id != page_id:
+                    linked_pages.add(target_id)
+
+        self.pages[page_id] = (linked_pages, assets)
+
+    def save(self):
+        """Write the graph to the project root"""
+        data = {
+            "version": GRAPH_VERSION,
+            "nodes": self.nodes,
+            "pages": {str(page_id): [sorted(linked), sorted(assets)]
+                      for page_id, (linked, assets) in self.pages.items()},
+        }
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        logger.info(f"Reference graph written to {self.path}: {len(self.pages)} pages, {len(self.nodes)} nodes")
+
+    @classmethod
+    def load(cls, project_root):
+        """Load the graph recorded by the last pipeline run"""
+        graph = cls(project_root)
+        with gzip.open(graph.path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != GRAPH_VERSION:
+            raise ValueError(f"Unsupported reference graph version: {data.get('version')}")
+        graph.nodes = data['nodes']
+        graph.node_ids = {rel_path: node_id for node_id, rel_path in enumerate(graph.nodes)}
+        graph.pages = {int(page_id): (set(linked), set(assets))
+                       for page_id, (linked, assets) in data['pages'].items()}
+        return graph
+
+    def recorded_pages(self):
+        """Paths of all pages whose references were recorded"""
+        return {self.nodes[page_id] for page_id in self.pages}
+
+    def referenced_assets(self):
+        """
+        Paths of all assets referenced by a page, including url() and @import
+        references inside referenced stylesheets
+        """
+        referenced = {self.nodes[asset_id] for _, assets in self.pages.values() for asset_id in assets}
+
+        pending = [rel_path for rel_path in referenced if rel_path.lower().endswith('.css')]
+        while pending:
+            css_path = self.project_root / pending.pop()
+            try:
+                css = css_path.read_text(encoding='utf-8', errors='ignore')
+            except OSError:
+                continue
+            for url in css_references(css):
+                rel_path = resolve_reference(url, css_path.parent, self.project_root)
+                if rel_path and is_asset(rel_path) and rel_path not in referenced:
+                    referenced.add(rel_path)
+                    if rel_path.lower().endswith('.css'):
+                        pending.append(rel_path)
+
+        return referenced
+
+    def orphaned_assets(self):
+        """
+        Images and stylesheets in the CDN directories that no page references
+        """
+        referenced = self.referenced_assets()
+        orphans = []
+        for domain in IMAGE_DOMAINS:
+            cdn_dir = self.project_root / domain
+            if not cdn_dir.is_dir():
+                continue
+            for root, dirs, files in os.walk(cdn_dir):
+                for file in files:
+                    if Path(file).suffix.lower() not in ASSET_EXTENSIONS:
+                        continue
+                    rel_path = os.path.relpath(os.path.join(root, file), self.project_root).replace('\\', '/')
+                    if rel_path not in referenced:
+                        orphans.append(rel_path)
+        return sorted(orphans)
+
+    def unlinked_pages(self):
+        """
+        Recorded pages that no other page links to
+        """
+        linked = {target_id for targets, _ in self.pages.values() for target_id in targets}
+        return sorted(self.nodes[page_id] for page_id in self.pages if page_id not in linked)
@@ -0,0 +1,392 @@
+"""
+Search indexer module - builds a sharded offline full-text index of the mirror
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+from collections import Counter, defaultdict
+from pathlib import Path
+from bs4 import NavigableString
+from bs4.element import PreformattedString
+from loguru import logger
+from postprocess.config import (
+    SEARCH_INDEX_DIR,
+    SEARCH_PREFIX_LENGTH,
+    SEARCH_MIN_TOKEN_LENGTH,
+    SEARCH_MAX_TERMS_PER_PAGE,
+    SEARCH_TITLE_WEIGHT,
+    SEARCH_SKIP_TAGS,
+    SEARCH_STOPWORDS,
+    SEARCH_MAX_POSTINGS_PER_TERM,
+    SEARCH_MAX_SHARD_BYTES,
+    SEARCH_FLUSH_POSTINGS,
+)
+
+INDEX_VERSION = 2
+DOCS_CHUNK_SIZE = 1000
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+SEARCH_PAGE = Path(__file__).parent / "static" / "search.html"
+
+# Index files are wrapped in a callback so the search page can load them
+# with <script> tags, which also works when the mirror is opened from disk
+SCRIPT_PREFIX = "searchIndexLoaded("
+SCRIPT_SUFFIX = ");\n"
+
+
+def visible_strings(element):
+    """
+    Yield the text of an element, skipping SEARCH_SKIP_TAGS subtrees and
+    comments without modifying the tree
+    """
+    stack = [element]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, NavigableString):
+            if not isinstance(node, PreformattedString):
+                yield node
+        elif node.name not in SEARCH_SKIP_TAGS:
+            stack.extend(reversed(node.contents))
+
+
+def extract_document(soup):
+    """
+    Extract the article title and visible text from a cleaned page
+    """
+    # Prefer the article heading, the <title> usually carries the wiki name as well
+    title = ''
+    heading = soup.find(id='firstHeading') or soup.find(class_='page-header__title') or soup.find('h1')
+    if heading:
+        title = heading.get_text(' ', strip=True)
+    elif soup.title:
+        title = soup.title.get_text(' ', strip=True)
+
+    body = soup.body or soup
+    text = ' '.join(string.strip() for string in visible_strings(body) if string.strip())
+
+    return title, text
+
+
+def tokenize(text):
+    """
+    Split text into lowercase search terms
+    """
+    return [token for token in TOKEN_PATTERN.findall(text.lower())
+            if len(token) >= SEARCH_MIN_TOKEN_LENGTH and token not in STOPWORDS]
+
+
+STOPWORDS = frozenset(SEARCH_STOPWORDS)
+
+
+def shard_filename(key):
+    """
+    Encode a shard key as a filesystem-safe name, mirrored by the search page
+    """
+    return ''.join(char if char.isascii() and char.isalnum() else f'_{ord(char):x}'
+                   for char in key) + '.js'
+
+
+def write_script(path, data):
+    """
+    Write index data as a script calling the search page's loader
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(SCRIPT_PREFIX)
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        f.write(SCRIPT_SUFFIX)
+
+
+def read_script(path):
+    """
+    Read index data written by write_script
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    return json.loads(content[len(SCRIPT_PREFIX):-len(SCRIPT_SUFFIX)])
+
+
+class SearchIndex:
+    """
+    Incrementally maintained inverted index, stored as one shard per term prefix
+
+    Layout of the index directory:
+      manifest.json   - per page: doc id, content hash, title and the shards it occurs in
+      meta.js         - settings the search page needs to query the shards
+      docs/<n>.js     - [path relative to project root, title] for a chunk of doc ids
+      shards/<key>.js - sorted terms and their postings as flat [doc id, weight, ...] lists
+    Only shards and doc chunks touched by new, changed or removed pages are rewritten.
+
+    Shards start at SEARCH_PREFIX_LENGTH characters. A shard that grows past
+    SEARCH_MAX_SHARD_BYTES is split: its longer terms move to shards one
+    character longer and the split is recorded in meta.js, along with the
+    shards below every split key for prefix queries. Changed pages get
+    a new doc id, so postings of their old id can be purged from any shard
+    at any time, which lets pending postings be flushed in batches.
+    """
+
+    def __init__(self, project_root, read_only=False):
+        self.project_root = Path(project_root)
+        self.read_only = read_only  # Index in memory only, as the dry run does
+        self.index_dir = self.project_root / SEARCH_INDEX_DIR
+        self.shard_dir = self.index_dir / "shards"
+        self.docs_dir = self.index_dir / "docs"
+        self.pages = {}  # relative path -> [doc id, hash, title, shard keys]
+        self.free_ids = []
+        self.next_id = 0
+        self.splits = set()  # Shard keys whose longer terms live in longer shards
+        self.stale_ids = set()
+        self.dirty_shards = set()
+        self.dirty_chunks = set()
+        self.pending = defaultdict(dict)  # shard key -> {term: [doc id, weight, ...]}
+        self.pending_postings = 0
+        self.updated_shards = set()
+        self.indexed = 0
+        self._load()
+
+    def _load(self):
+        """Load the manifest of a previous run, starting over if it is missing or outdated"""
+        manifest_path = self.index_dir / "manifest.json"
+        manifest = None
+
+        if manifest_path.exists():
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read search manifest, rebuilding index: {e}")
+
+        if manifest and (manifest.get('version') != INDEX_VERSION
+                         or manifest.get('prefix_length') != SEARCH_PREFIX_LENGTH):
+            logger.info("Search index format changed, rebuilding index")
+            manifest = None
+
+        if manifest is None:
+            if self.read_only:
+                return
+            # Leftover shards would reference doc ids that are about to be reassigned
+            shutil.rmtree(self.shard_dir, ignore_errors=True)
+            shutil.rmtree(self.docs_dir, ignore_errors=True)
+            return
+
+        self.pages = manifest['pages']
+        self.splits = set(manifest['splits'])
+        used_ids = {entry[0] for entry in self.pages.values()}
+        self.next_id = max(used_ids, default=-1) + 1
+        self.free_ids = sorted(set(range(self.next_id)) - used_ids, reverse=True)
+        logger.info(f"Loaded search index with {len(self.pages)} pages")
+
+    def shard_key(self, term):
+        """
+        Get the shard a term belongs to (its leading characters, longer for split shards)
+        """
+        key = term[:SEARCH_PREFIX_LENGTH]
+        while key in self.splits and len(term) > len(key):
+            key = term[:len(key) + 1]
+        return key
+
+    def add_page(self, soup, current_file_path):
+        """
+        Index a page from its cleaned tree unless its text is unchanged since the last run
+        """
+        rel_path = Path(current_file_path).relative_to(self.project_root).as_posix()
+        title, text = extract_document(soup)
+        # Hash the extracted text, link rewriting changes the markup between runs
+        digest = hashlib.sha1(f"{title}\n{text}".encode('utf-8', errors='ignore')).hexdigest()
+
+        entry = self.pages.get(rel_path)
+        if entry and entry[1] == digest:
+            return False
+
+        counts = Counter(tokenize(text))
+        if len(counts) > SEARCH_MAX_TERMS_PER_PAGE:
+            counts = Counter(dict(counts.most_common(SEARCH_MAX_TERMS_PER_PAGE)))
+        for term in set(tokenize(title)):
+            counts[term] += SEARCH_TITLE_WEIGHT
+
+        if entry:
+            self._release(entry)
+        doc_id = self.free_ids.pop() if self.free_ids else self._new_id()
+
+        keys = set()
+        for term, weight in counts.items():
+            key = self.shard_key(term)
+            keys.add(key)
+            self.pending[key].setdefault(term, []).extend((doc_id, weight))
+        self.pending_postings += len(counts)
+
+        self.dirty_shards.update(keys)
+        self.dirty_chunks.add(doc_id // DOCS_CHUNK_SIZE)
+        self.pages[rel_path] = [doc_id, digest, title, sorted(keys)]
+        self.indexed += 1
+        logger.debug(f"Indexed {rel_path}: {len(counts)} terms")
+
+        if self.pending_postings >= SEARCH_FLUSH_POSTINGS and not self.read_only:
+            self._flush()
+        return True
+
+    def _release(self, entry):
+        """Mark a doc id stale so its postings get purged; it is reused from the next run on"""
+        doc_id, _, _, keys = entry
+        self.stale_ids.add(doc_id)
+        self.dirty_shards.update(keys)
+        self.dirty_chunks.add(doc_id // DOCS_CHUNK_SIZE)
+
+    def _new_id(self):
+        doc_id = self.next_id
+        self.next_id += 1
+        return doc_id
+
+    def _prune_missing(self):
+        """Drop pages that no longer exist in the mirror"""
+        for rel_path in list(self.pages):
+            if not (self.project_root / rel_path).exists():
+                self._release(self.pages.pop(rel_path))
+                logger.debug(f"Removed {rel_path} from search index")
+
+    def _begin_update(self):
+        """
+        Remove the manifest before the first shard is touched, so an interrupted
+        run leads to a rebuild instead of reused doc ids with leftover postings
+        """
+        manifest_path = self.index_dir / "manifest.json"
+        if manifest_path.exists():
+            manifest_path.unlink()
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+
+    def _write_shard(self, key):
+        """Merge pending postings into a shard, dropping postings of stale docs"""
+        shard_path = self.shard_dir / shard_filename(key)
+        postings = {}
+
+        if shard_path.exists():
+            shard = read_script(shard_path)
+            for term, flat in zip(shard['terms'], shard['postings']):
+                kept = [value for doc_id, weight in zip(flat[::2], flat[1::2])
+                        if doc_id not in self.stale_ids for value in (doc_id, weight)]
+                if kept:
+                    postings[term] = kept
+
+        for term, flat in self.pending.pop(key, {}).items():
+            postings.setdefault(term, []).extend(flat)
+
+        self._store_shard(key, postings)
+
+    def _store_shard(self, key, postings):
+        """Write a shard, splitting it if it grew too large"""
+        shard_path = self.shard_dir / shard_filename(key)
+        self.updated_shards.add(key)
+
+        if not postings:
+            if shard_path.exists():
+                shard_path.unlink()
+            return
+
+        terms = sorted(postings)
+        shard = {"shard": key, "terms": terms, "postings": []}
+        for term in terms:
+            # Highest weights first so the search page can stop early, very
+            # common terms only keep their best matching pages
+            pairs = sorted(zip(postings[term][::2], postings[term][1::2]), key=lambda p: -p[1])
+            pairs = pairs[:SEARCH_MAX_POSTINGS_PER_TERM]
+            shard["postings"].append([value for pair in pairs for value in pair])
+
+        data = json.dumps(shard, ensure_ascii=False, separators=(',', ':'))
+        if len(data.encode('utf-8')) > SEARCH_MAX_SHARD_BYTES and any(len(term) > len(key) for term in terms):
+            self._split(key, dict(zip(terms, shard["postings"])))
+            return
+
+        with open(shard_path, 'w', encoding='utf-8') as f:
+            f.write(SCRIPT_PREFIX + data + SCRIPT_SUFFIX)
+
+    def _split(self, key, postings):
+        """Move the terms longer than the key to shards one character longer"""
+        self.splits.add(key)
+        shards = defaultdict(dict)
+        for term, flat in postings.items():
+            shards[term[:len(key) + 1] if len(term) > len(key) else key][term] = flat
+        shards.setdefault(key, {})
+        logger.debug(f"Split search shard {key!r} into {len(shards) - 1} shards")
+
+        # Pages remember their shards so they can be purged when they change.
+        # Update them before storing, children may be split again.
+        doc_keys = defaultdict(set)
+        for child, child_postings in shards.items():
+            for flat in child_postings.values():
+                for doc_id in flat[::2]:
+                    doc_keys[doc_id].add(child)
+        for entry in self.pages.values():
+            if key in entry[3]:
+                entry[3] = sorted((set(entry[3]) - {key}) | doc_keys.get(entry[0], set()))
+
+        for child, child_postings in shards.items():
+            self._store_shard(child, child_postings)
+
+    def _flush(self):
+        """Write the shards with pending postings to keep memory bounded"""
+        self._begin_update()
+        for key in list(self.pending):
+            self._write_shard(key)
+            self.dirty_shards.discard(key)
+        self.pending_postings = 0
+
+    def write(self):
+        """
+        Write changed shards, the document table and the search page
+        """
+        if self.read_only:
+            raise RuntimeError("Search index was opened read-only")
+        self._prune_missing()
+        self._begin_update()
+        self.docs_dir.mkdir(parents=True, exist_ok=True)
+
+        for key in self.dirty_shards | set(self.pending):
+            self._write_shard(key)
+
+        if self.dirty_chunks:
+            chunks = {chunk: [None] * DOCS_CHUNK_SIZE for chunk in self.dirty_chunks}
+            for rel_path, (doc_id, _, title, _) in self.pages.items():
+                chunk = chunks.get(doc_id // DOCS_CHUNK_SIZE)
+                if chunk is not None:
+                    chunk[doc_id % DOCS_CHUNK_SIZE] = [rel_path, title or Path(rel_path).stem]
+            for chunk, docs in chunks.items():
+                write_script(self.docs_dir / f"{chunk}.js", {"chunk": chunk, "docs": docs})
+
+        # Query words ending at a split key have to scan the shards below it
+        children = defaultdict(list)
+        for key in sorted({key for entry in self.pages.values() for key in entry[3]} | self.splits):
+            if len(key) > SEARCH_PREFIX_LENGTH and key[:-1] in self.splits:
+                children[key[:-1]].append(key)
+
+        root = os.path.relpath(self.project_root, self.index_dir).replace('\\', '/')
+        write_script(self.index_dir / "meta.js", {
+            "meta": True,
+            "prefix_length": SEARCH_PREFIX_LENGTH,
+            "min_token_length": SEARCH_MIN_TOKEN_LENGTH,
+            "docs_chunk_size": DOCS_CHUNK_SIZE,
+            "splits": sorted(self.splits),
+            "children": children,
+            "stopwords": SEARCH_STOPWORDS,
+            "root": root,
+        })
+
+        manifest = {
+            "version": INDEX_VERSION,
+            "prefix_length": SEARCH_PREFIX_LENGTH,
+            "splits": sorted(self.splits),
+            "pages": self.pages,
+        }
+        with open(self.index_dir / "manifest.json", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+
+        shutil.copyfile(SEARCH_PAGE, self.index_dir / "index.html")
+
+        logger.info(f"Search index written to {self.index_dir}: {self.indexed} pages (re)indexed, "
+                    f"{len(self.updated_shards)} shards updated, {len(self.pages)} pages total")
+
+        self.stale_ids.clear()
+        self.dirty_shards.clear()
+        self.dirty_chunks.clear()
+        self.updated_shards.clear()
+        self.pending_postings = 0
+        self.indexed = 0